@@ -0,0 +1,71 @@
+"""
+Runs actions back to back in one process through the sema4ai-actions hooks, as the action
+server does, and checks that each run sees its own invocation context, both in the result of
+`get_context` and in the resource attributes of the exported trace.
+
+    python devdata/check_tracing.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from sema4ai.actions._action import set_current_action, set_current_requests_contexts
+from sema4ai.actions._action_context import RequestContexts
+from sema4ai.actions._hooks import after_action_run, before_action_run
+from sema4ai.actions._request import Request
+
+import actions
+
+
+class _Action:
+    """The attributes of `sema4ai.actions.IAction` used by the tracing fixture."""
+
+    def __init__(self, func):
+        self.name = func.__name__
+        self.filename = actions.__file__
+        self.failed = False
+        self.message = ""
+
+
+def run_action(func, thread_id: str):
+    # Same order as `sema4ai.actions._commands`: the setup fixtures run before the request
+    # contexts are set, the teardowns run while they are still set.
+    action = _Action(func)
+    set_current_action(action)
+    before_action_run(action)
+    try:
+        request = Request.model_validate({"headers": {"X-INVOKED_FOR_THREAD_ID": thread_id}, "cookies": {}})
+        set_current_requests_contexts(RequestContexts(request))
+        return func()
+    finally:
+        after_action_run(action)
+        set_current_action(None)
+        set_current_requests_contexts(None)
+
+
+def main():
+    traces_file = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    os.environ["ACTION_TRACES_FILE"] = traces_file
+    thread_ids = ["thread-1", "thread-2", "thread-3"]
+
+    returned = [run_action(actions.get_context, thread_id).result.thread_id for thread_id in thread_ids]
+    with open(traces_file, "r", encoding="utf-8") as f:
+        exported = [
+            {a["key"]: a["value"]["stringValue"] for a in json.loads(line)["resourceSpans"][0]["resource"]["attributes"]}
+            for line in f
+        ]
+    exported = [attributes["sema4ai.thread_id"] for attributes in exported]
+
+    print(f"expected:  {thread_ids}\nget_context: {returned}\nexported:  {exported}")
+    if returned != thread_ids or exported != thread_ids:
+        sys.exit("FAILED: an invocation context leaked into another action run")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Invocation-scoped tracing for actions.
+
+Spans are keyed by the agent invocation context (thread, agent and action invocation IDs)
+and appended to a local file in the OTLP JSON format (one `ExportTraceServiceRequest` per
+line, the same format the OpenTelemetry Collector file exporter writes), so they can be
+loaded into any OTLP-aware tool or summarized with `python tracing.py <file>`.
+
+The module has no dependencies beyond `sema4ai-actions`, so it can be copied as-is into
+any action package. Importing it wraps every action run in a span; nested spans and
+traced HTTP calls are added with:
+
+    import tracing
+
+    @action
+    def my_action(...):
+        with tracing.span("parse"):
+            ...
+        response = tracing.get("https://example.com")
+
+Spans are written to `$ACTION_TRACES_FILE`, defaulting to `traces.jsonl` in the run
+output directory.
+"""
+
+import contextvars
+import json
+import os
+import secrets
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field
+from sema4ai.actions import action_cache, get_output_dir, setup
+from sema4ai.actions._action import get_current_requests_contexts
+
+STUDIO_CONFIG_FILE = os.path.expanduser("~/.sema4ai/sema4ai-studio/config.json")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "sema4ai-actions")
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+
+class InvocationContext(BaseModel):
+    workspace_id: Optional[str] = Field(default=None, description="Tenant ID (workspace)")
+    agent_id: Optional[str] = Field(default=None, description="Agent ID")
+    thread_id: Optional[str] = Field(default=None, description="Thread ID")
+    invoked_on_behalf_of_user_id: Optional[str] = Field(default=None, description="User ID on whose behalf the action is invoked")
+    action_invocation_id: Optional[str] = Field(default=None, description="Action invocation ID")
+
+    class Config:
+        extra = "allow"
+
+
+_config_cache_lock = threading.Lock()
+_config_cache: Dict[str, tuple] = {}
+
+_current_trace: contextvars.ContextVar[Optional["_Trace"]] = contextvars.ContextVar("_current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional["_Span"]] = contextvars.ContextVar("_current_span", default=None)
+
+_write_lock = threading.Lock()
+
+
+def read_studio_config(config_file: str = STUDIO_CONFIG_FILE) -> dict:
+    """Returns the Studio config, re-reading the file only when its mtime changes."""
+    try:
+        stat = os.stat(config_file)
+    except OSError:
+        return {}
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _config_cache_lock:
+        cached = _config_cache.get(config_file)
+        if cached and cached[0] == key:
+            return cached[1]
+    try:
+        with open(config_file, "r") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+    with _config_cache_lock:
+        _config_cache[config_file] = (key, config)
+    return config
+
+
+@action_cache
+def get_invocation_context() -> InvocationContext:
+    """Resolves the invocation context of the current request.
+
+    The result is cached until the current action finishes, so the context is
+    resolved once per request no matter how many spans use it.
+    """
+    return _resolve_invocation_context()
+
+
+def _resolve_invocation_context() -> InvocationContext:
+    """Resolves the invocation context of the current request, without caching.
+
+    Used from action teardown: the cache of `get_invocation_context` may already
+    be cleared at that point, and filling it again would leak the context into
+    the next action run in the same process.
+    """
+    current_requests_contexts = get_current_requests_contexts()
+    if current_requests_contexts is None:
+        return InvocationContext(request_type="NONE")
+
+    invocation_context_raw = current_requests_contexts.invocation_context
+    if invocation_context_raw and invocation_context_raw.value:
+        return _create_workroom_context(invocation_context_raw)
+    return _create_local_context(current_requests_contexts._request)
+
+
+def _create_workroom_context(invocation_context_raw) -> InvocationContext:
+    request_type = "WORK ROOM"
+    workspace_id = invocation_context_raw.value.get('tenant_id', "UNKNOWN")
+    agent_id = invocation_context_raw.value.get('agent_id', "UNKNOWN")
+    thread_id = invocation_context_raw.value.get('thread_id', "UNKNOWN")
+    action_invocation_id = invocation_context_raw.value.get('action_invocation_id', "UNKNOWN")
+    invoked_on_behalf_of_user_id = invocation_context_raw.value.get('invoked_on_behalf_of_user_id', "UNKNOWN")
+    return InvocationContext(
+        workspace_id=workspace_id,
+        agent_id=agent_id,
+        thread_id=thread_id,
+        action_invocation_id=action_invocation_id,
+        invoked_on_behalf_of_user_id=invoked_on_behalf_of_user_id,
+        request_type=request_type
+    )
+
+
+def _create_local_context(request) -> InvocationContext:
+    request_type = "LOCAL"
+    headers = request.headers
+    invoked_on_behalf_of_user_id = read_studio_config().get('crUserEmail', "UNKNOWN")
+    workspace_id = "UNKNOWN"
+    agent_id = headers.get('X-INVOKED_BY_ASSISTANT_ID', "UNKNOWN")
+    thread_id = headers.get('X-INVOKED_FOR_THREAD_ID', "UNKNOWN")
+    action_invocation_id = headers.get('X-ACTION_INVOCATION_ID', "UNKNOWN")
+    return InvocationContext(
+        workspace_id=workspace_id,
+        agent_id=agent_id,
+        thread_id=thread_id,
+        action_invocation_id=action_invocation_id,
+        invoked_on_behalf_of_user_id=invoked_on_behalf_of_user_id,
+        request_type=request_type
+    )
+
+
+def get_traces_file() -> str:
+    traces_file = os.getenv("ACTION_TRACES_FILE")
+    if traces_file:
+        return traces_file
+    return os.path.join(get_output_dir() or "output", "traces.jsonl")
+
+
+class _Trace:
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.finished_spans: List["_Span"] = []
+        self.lock = threading.Lock()
+        # Set by the action span once the request contexts are available
+        # (they are not yet when the action span starts).
+        self.invocation_context: Optional[InvocationContext] = None
+
+    def resource_attributes(self) -> dict:
+        invocation_context = self.invocation_context or _resolve_invocation_context()
+        return {
+            "service.name": SERVICE_NAME,
+            "sema4ai.workspace_id": invocation_context.workspace_id,
+            "sema4ai.agent_id": invocation_context.agent_id,
+            "sema4ai.thread_id": invocation_context.thread_id,
+            "sema4ai.action_invocation_id": invocation_context.action_invocation_id,
+            "sema4ai.request_type": getattr(invocation_context, "request_type", None),
+            "enduser.id": invocation_context.invoked_on_behalf_of_user_id,
+        }
+
+
+class _Span:
+    def __init__(self, trace: _Trace, parent: Optional["_Span"], name: str, kind: int, attributes: dict):
+        self.trace = trace
+        self.parent = parent
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.span_id = secrets.token_hex(8)
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+        self.status_code = STATUS_CODE_OK
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        otlp_span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time_unix_nano),
+            "endTimeUnixNano": str(self.end_time_unix_nano),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+        if self.parent:
+            otlp_span["parentSpanId"] = self.parent.span_id
+        return otlp_span
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes) -> Iterator[_Span]:
+    """Opens a span as a child of the current span.
+
+    The outermost span of a request starts a new trace tagged with the invocation
+    context, and the whole trace is written to the traces file once it ends.
+    """
+    trace = _current_trace.get()
+    is_root = trace is None
+    if is_root:
+        trace = _Trace()
+    current = _Span(trace, _current_span.get(), name, kind, attributes)
+
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status_code = STATUS_CODE_ERROR
+        current.status_message = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_time_unix_nano = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        with trace.lock:
+            trace.finished_spans.append(current)
+        if is_root:
+            _export(trace)
+
+
+@setup
+def _trace_action(action):
+    with span(action.name, **{"code.function": action.name, "code.filepath": action.filename}) as current:
+        yield
+        current.trace.invocation_context = _resolve_invocation_context()
+        if action.failed:
+            current.status_code = STATUS_CODE_ERROR
+            current.status_message = action.message
+
+
+def _traced_http(method: str, url: str, **kwargs):
+    import sema4ai_http
+
+    with span(f"HTTP {method.upper()}", kind=SPAN_KIND_CLIENT, **{"http.request.method": method.upper(), "url.full": url}) as current:
+        response = getattr(sema4ai_http, method)(url, **kwargs)
+        current.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 400:
+            current.status_code = STATUS_CODE_ERROR
+        return response
+
+
+def get(url, **kwargs):
+    """`sema4ai_http.get` wrapped in a client span."""
+    return _traced_http("get", url, **kwargs)
+
+
+def post(url, **kwargs):
+    """`sema4ai_http.post` wrapped in a client span."""
+    return _traced_http("post", url, **kwargs)
+
+
+def _otlp_attributes(attributes: dict) -> List[dict]:
+    otlp_attributes = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            otlp_value = {"boolValue": value}
+        elif isinstance(value, int):
+            otlp_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            otlp_value = {"doubleValue": value}
+        else:
+            otlp_value = {"stringValue": str(value)}
+        otlp_attributes.append({"key": key, "value": otlp_value})
+    return otlp_attributes
+
+
+def _export(trace: _Trace) -> None:
+    request = {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes(trace.resource_attributes())},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "cookbook.tracing"},
+                        "spans": [s.to_otlp() for s in trace.finished_spans],
+                    }
+                ],
+            }
+        ]
+    }
+    traces_file = get_traces_file()
+    line = json.dumps(request, separators=(",", ":")) + "\n"
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(traces_file)), exist_ok=True)
+            with open(traces_file, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        # Tracing must never break the action itself.
+        print(f"Unable to write traces to {traces_file}: {e}", file=sys.stderr)
+
+
+def summarize(traces_file: str) -> Dict[str, Dict[str, dict]]:
+    """Aggregates span durations (ms) per agent, per thread and per span name."""
+    durations = {"agent": defaultdict(list), "thread": defaultdict(list), "span": defaultdict(list)}
+    with open(traces_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource_spans in json.loads(line)["resourceSpans"]:
+                resource = {
+                    a["key"]: next(iter(a["value"].values()))
+                    for a in resource_spans["resource"]["attributes"]
+                }
+                for scope_spans in resource_spans["scopeSpans"]:
+                    for s in scope_spans["spans"]:
+                        duration_ms = (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6
+                        durations["span"][s["name"]].append(duration_ms)
+                        if "parentSpanId" not in s:
+                            durations["agent"][resource.get("sema4ai.agent_id", "UNKNOWN")].append(duration_ms)
+                            durations["thread"][resource.get("sema4ai.thread_id", "UNKNOWN")].append(duration_ms)
+
+    def stats(values: List[float]) -> dict:
+        values = sorted(values)
+        return {
+            "count": len(values),
+            "p50": statistics.median(values),
+            "p90": values[min(len(values) - 1, int(len(values) * 0.9))],
+            "max": values[-1],
+            "total": sum(values),
+        }
+
+    return {group: {key: stats(values) for key, values in by_key.items()} for group, by_key in durations.items()}
+
+
+if __name__ == "__main__":
+    summary = summarize(sys.argv[1] if len(sys.argv) > 1 else get_traces_file())
+    for group, by_key in summary.items():
+        print(f"Latency per {group} (ms):")
+        for key, s in sorted(by_key.items(), key=lambda item: -item[1]["total"]):
+            print(f"\t{key}: count={s['count']} p50={s['p50']:.1f} p90={s['p90']:.1f} max={s['max']:.1f} total={s['total']:.1f}")
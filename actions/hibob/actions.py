@@ -1,12 +1,48 @@
 from dotenv import load_dotenv
+import csv
+import io
 import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from sema4ai_http import post
+from typing import List, Optional
 
-from sema4ai.actions import action, Response, Secret
+import urllib3
+from pydantic import BaseModel, Field
+from sema4ai_http import ResponseWrapper, build_ssl_context, get_network_profile, post
+
+from sema4ai.actions import action, ActionError, Response, Secret
 
 load_dotenv(Path(__file__).absolute().parent / "devdata" / ".env")
 
+# Base URL can be pointed to a local mock (see devdata/mock_hibob.py) for testing.
+API_URL = os.getenv("HIBOB_API_URL", "https://api.hibob.com").rstrip("/")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+
+class Employee(BaseModel):
+    first_name: str = Field(description="Employee's first name")
+    surname: str = Field(description="Employee's surname")
+    email: str = Field(description="Employee's email address")
+    site: str = Field(description="Employee's site")
+    start_date: str = Field(description="Employee's start date e.g. 2024-06-22")
+    department: str = Field(description="Employee's job department")
+
+
+class EmployeeResult(BaseModel):
+    row: int = Field(description="Row number of the employee in the input (1-based)")
+    email: str = Field(description="Employee's email address")
+    status: str = Field(description="One of 'created', 'skipped' or 'error'")
+    http_status: Optional[int] = Field(default=None, description="Last HTTP status from HiBob")
+    attempts: int = Field(default=0, description="Number of requests made for the row")
+    message: str = Field(default="", description="Details about the result")
+
 
 @action
 def create_hibob(
@@ -32,25 +68,226 @@ def create_hibob(
     Returns:
         Result of the action
     """
-    url = "https://api.hibob.com/v1/people"
-    headers = {
+    url = f"{API_URL}/v1/people"
+    headers = _headers(api_key)
+    payload = _employee_payload(
+        Employee(
+            first_name=first_name,
+            surname=surname,
+            email=email,
+            site=site,
+            start_date=start_date,
+            department=department,
+        )
+    )
+    response = post(url, headers=headers, json=payload)
+    response.raise_for_status()
+    if response.status_code != 200:
+        error_message = response.json().get("error", "Unknown error")
+        return Response(result="error", error_message=error_message)
+    return Response(result="ok")
+
+
+@action
+def create_hibob_bulk(
+    employees: List[Employee] = [],
+    employees_csv: str = "",
+    max_concurrency: int = 4,
+    api_key: Secret = Secret.model_validate(os.getenv("HIBOB_API_KEY", "")),
+) -> Response[List[EmployeeResult]]:
+    """Creates many new employees in the Hibob system at once.
+
+    Employees whose email already exists in Hibob (or appears earlier in the
+    input) are skipped, so the action can be safely re-run with the same input.
+
+    Args:
+        employees: Employees to create.
+        employees_csv: Employees to create as CSV text with the header
+            first_name,surname,email,site,start_date,department
+        max_concurrency: Maximum number of parallel requests to Hibob.
+        api_key: API key for Hibob authentication.
+
+    Returns:
+        Per-row result of the onboarding.
+    """
+    rows = list(employees) + _parse_employees_csv(employees_csv)
+    if not rows:
+        raise ActionError("No employees given in 'employees' or 'employees_csv'")
+
+    max_concurrency = max(1, max_concurrency)
+    pool = _build_pool_manager(max_concurrency)
+    headers = _headers(api_key)
+
+    existing_emails = _get_existing_emails(pool, headers)
+    results: List[Optional[EmployeeResult]] = [None] * len(rows)
+    to_create = []
+    seen_emails = set()
+    for index, employee in enumerate(rows):
+        email = employee.email.strip().lower()
+        if email in existing_emails:
+            results[index] = EmployeeResult(
+                row=index + 1, email=employee.email, status="skipped", message="Already exists in Hibob"
+            )
+        elif email in seen_emails:
+            results[index] = EmployeeResult(
+                row=index + 1, email=employee.email, status="skipped", message="Duplicate email in input"
+            )
+        else:
+            seen_emails.add(email)
+            to_create.append(index)
+
+    def create(index: int) -> EmployeeResult:
+        employee = rows[index]
+        result = EmployeeResult(row=index + 1, email=employee.email, status="error")
+        attempts = []
+        try:
+            response = _post_with_retries(
+                pool, f"{API_URL}/v1/people", headers, _employee_payload(employee), attempts
+            )
+        except urllib3.exceptions.HTTPError as e:
+            response = None
+            result.message = str(e)
+        result.attempts = len(attempts)
+        if response is not None:
+            result.http_status = response.status_code
+            if response.ok():
+                result.status = "created"
+                return result
+            result.message = _error_message(response)
+
+        # Creating an employee is not idempotent: an earlier attempt answered with a server error
+        # or cut off mid-request may still have created it, so a retry then fails with
+        # "already exists". Check whether the email exists before reporting an error.
+        last_failed = response is None or response.status_code in RETRY_STATUSES
+        if any(attempts[:-1]) or (last_failed and attempts[-1]):
+            try:
+                exists = employee.email.strip().lower() in _get_existing_emails(pool, headers)
+            except (ActionError, urllib3.exceptions.HTTPError):
+                exists = False
+            if exists:
+                result.status = "created"
+                result.message = "Created, confirmed by email after a failed attempt"
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for index, result in zip(to_create, executor.map(create, to_create)):
+            results[index] = result
+
+    pool.clear()
+    return Response(result=results)
+
+
+def _headers(api_key: Secret) -> dict:
+    return {
         "Authorization": f"Basic {api_key.value}",
         "Content-Type": "application/json",
         "Accept": "application/json",
     }
-    payload = {
-        "firstName": first_name,
-        "surname": surname,
-        "email": email,
+
+
+def _employee_payload(employee: Employee) -> dict:
+    return {
+        "firstName": employee.first_name,
+        "surname": employee.surname,
+        "email": employee.email,
         "work": {
-            "site": site,
-            "startDate": start_date,
-            "department": department,
+            "site": employee.site,
+            "startDate": employee.start_date,
+            "department": employee.department,
         },
     }
-    response = post(url, headers=headers, json=payload)
-    response.raise_for_status()
-    if response.status_code != 200:
-        error_message = response.json().get("error", "Unknown error")
-        return Response(result="error", error_message=error_message)
-    return Response(result="ok")
+
+
+def _parse_employees_csv(employees_csv: str) -> List[Employee]:
+    if not employees_csv.strip():
+        return []
+    reader = csv.DictReader(io.StringIO(employees_csv.strip()))
+    try:
+        return [
+            Employee(**{key.strip(): (value or "").strip() for key, value in row.items() if key})
+            for row in reader
+        ]
+    except ValueError as e:
+        raise ActionError(f"Invalid employees CSV: {e}")
+
+
+def _build_pool_manager(max_connections: int) -> urllib3.PoolManager:
+    """One pool shared by all workers, blocking when all connections are in use."""
+    proxies = get_network_profile().proxy_config.https
+    kwargs = dict(maxsize=max_connections, block=True, ssl_context=build_ssl_context(), retries=False)
+    if proxies:
+        return urllib3.ProxyManager(proxies[0], **kwargs)
+    return urllib3.PoolManager(**kwargs)
+
+
+def _get_existing_emails(pool: urllib3.PoolManager, headers: dict) -> set:
+    response = _post_with_retries(
+        pool,
+        f"{API_URL}/v1/people/search",
+        headers,
+        {"fields": ["root.email"], "showInactive": True},
+    )
+    if not response.ok():
+        raise ActionError(f"Could not list existing employees: {_error_message(response)}")
+    return {
+        employee["email"].strip().lower()
+        for employee in response.json().get("employees", [])
+        if employee.get("email")
+    }
+
+
+def _post_with_retries(
+    pool: urllib3.PoolManager, url: str, headers: dict, payload: dict, attempts: Optional[list] = None
+) -> ResponseWrapper:
+    """Retries rate limited (429) and server error responses, honoring the
+    Retry-After header when given and otherwise backing off exponentially
+    with full jitter.
+
+    One entry is appended to `attempts` per request made: whether the server
+    may have processed it (False for rate limited requests and connections
+    that could not be established).
+    """
+    if attempts is None:
+        attempts = []
+    while True:
+        try:
+            response = ResponseWrapper(pool.request("POST", url, headers=headers, json=payload))
+        except (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError):
+            attempts.append(False)
+            if len(attempts) > MAX_RETRIES:
+                raise
+            time.sleep(_backoff_delay(len(attempts), None))
+            continue
+        except urllib3.exceptions.HTTPError:
+            attempts.append(True)
+            if len(attempts) > MAX_RETRIES:
+                raise
+            time.sleep(_backoff_delay(len(attempts), None))
+            continue
+        attempts.append(response.status_code != 429)
+        if response.status_code not in RETRY_STATUSES or len(attempts) > MAX_RETRIES:
+            return response
+        time.sleep(_backoff_delay(len(attempts), response.headers.get("Retry-After")))
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[str]) -> float:
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS) + random.uniform(0, BACKOFF_BASE_SECONDS)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                return min(max(delay, 0.0), BACKOFF_MAX_SECONDS) + random.uniform(0, BACKOFF_BASE_SECONDS)
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+
+
+def _error_message(response: ResponseWrapper) -> str:
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text or f"HTTP {response.status_code}"
+    if isinstance(body, dict):
+        return str(body.get("error") or body.get("message") or body)
+    return str(body)
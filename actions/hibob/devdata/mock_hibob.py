@@ -0,0 +1,97 @@
+"""
+Local mock of the HiBob `/v1/people` API for testing the actions without a HiBob account.
+
+Run it and point the actions to it:
+
+    python devdata/mock_hibob.py --port 8080 --rate-limit-every 5
+    HIBOB_API_URL=http://localhost:8080 action-server run ...
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockHibob:
+    def __init__(self, rate_limit_every: int = 0, retry_after: float = 0.1, error_after_create_every: int = 0):
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        # Every Nth created employee is answered with 503, as if the response was lost
+        self.error_after_create_every = error_after_create_every
+        self.people = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state: MockHibob):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+
+            with state.lock:
+                state.requests += 1
+                rate_limited = state.rate_limit_every and state.requests % state.rate_limit_every == 0
+            if rate_limited:
+                self._send(429, {"error": "Too many requests"}, {"Retry-After": str(state.retry_after)})
+                return
+
+            if self.path == "/v1/people/search":
+                with state.lock:
+                    employees = [{"email": email} for email in state.people]
+                self._send(200, {"employees": employees})
+            elif self.path == "/v1/people":
+                email = payload.get("email", "").lower()
+                with state.lock:
+                    if email in state.people:
+                        self._send(400, {"error": f"Employee with email {email} already exists"})
+                        return
+                    state.people[email] = payload
+                    created = len(state.people)
+                if state.error_after_create_every and created % state.error_after_create_every == 0:
+                    self._send(503, {"error": "Service unavailable"})
+                    return
+                self._send(200, {"id": str(created), "email": email})
+            else:
+                self._send(404, {"error": "Not found"})
+
+    return Handler
+
+
+def serve(port: int = 0, rate_limit_every: int = 0, retry_after: float = 0.1, error_after_create_every: int = 0):
+    """Starts the mock in a background thread and returns (server, state)."""
+    state = MockHibob(rate_limit_every, retry_after, error_after_create_every)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds sent with 429")
+    parser.add_argument(
+        "--error-after-create-every", type=int, default=0, help="Create every Nth employee but answer with 503"
+    )
+    args = parser.parse_args()
+    state = MockHibob(args.rate_limit_every, args.retry_after, args.error_after_create_every)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"Mock HiBob listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,169 @@
+"""
+The customers_pool.py runs the queries that only read the `public_demo` customers database
+directly on Postgres, through a connection pool shared by all the actions of the process.
+
+`datasource.query` sends the SQL to the data server, which connects to Postgres and plans the
+statement again for every call. When PUBLIC_DEMO_POSTGRES_URL is set (e.g.
+`postgresql://demo_user:<password>@<host>:5432/postgres`), `query_customers` instead borrows a
+connection from the pool:
+
+- The pool holds at most PUBLIC_DEMO_POOL_MAX_SIZE connections (default 8), callers beyond that wait.
+- Connections unused for more than CHECK_IDLE_AFTER seconds are checked before they are handed
+  out and replaced if the server dropped them. A query failing on a broken connection is retried
+  once on another one.
+- Connections idle for longer than PUBLIC_DEMO_POOL_MAX_IDLE seconds (default 300) are closed.
+- Statements are prepared on their first execution on a connection and re-executed with new
+  parameters afterwards.
+
+Without PUBLIC_DEMO_POSTGRES_URL the queries go through the data server as before.
+Queries joining other data sources (e.g. the sales files) always go through the data server.
+"""
+
+import atexit
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Union
+from weakref import WeakKeyDictionary
+
+from sema4ai.data import DataSource, ResultSet
+
+POSTGRES_URL_ENV = "PUBLIC_DEMO_POSTGRES_URL"
+DEFAULT_POOL_MAX_SIZE = int(os.getenv("PUBLIC_DEMO_POOL_MAX_SIZE", "8"))
+DEFAULT_POOL_MAX_IDLE = float(os.getenv("PUBLIC_DEMO_POOL_MAX_IDLE", "300"))
+
+# Connections used more recently than this are handed out without a health check round trip
+CHECK_IDLE_AFTER = 30.0
+
+# Data source name used as the schema prefix in the data server SQL
+DATASOURCE_NAME = "public_demo"
+
+_pool = None
+_pool_lock = threading.Lock()
+_last_used: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def query_customers(
+    datasource: DataSource, sql: str, params: Optional[Dict[str, Union[str, int, float]]] = None
+) -> ResultSet:
+    """
+    Run a query that only reads `public_demo` tables, directly on Postgres when
+    PUBLIC_DEMO_POSTGRES_URL is set or through the data server otherwise.
+
+    Args:
+        datasource: The customer datasource.
+        sql: Data server SQL with `$name` parameters (e.g. `SELECT ... FROM public_demo.demo_customers`).
+        params: The values of the parameters.
+    """
+    pool = get_pool()
+    if pool is None:
+        return datasource.query(sql, params=params)
+
+    return query_pool(pool, to_postgres_sql(sql), params)
+
+
+def query_pool(pool, postgres_sql: str, params: Optional[dict] = None) -> ResultSet:
+    """
+    Run Postgres SQL with `%(name)s` parameters on a connection borrowed from the pool.
+    """
+    import psycopg
+
+    for attempt in range(2):
+        with pool.connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(postgres_sql, params or None)
+                    columns = [column.name for column in cursor.description]
+                    return ResultSet(columns, [list(row) for row in cursor.fetchall()])
+            except psycopg.OperationalError:
+                # The pool discards the broken connection when it's given back
+                if attempt or not conn.broken:
+                    raise
+
+
+def to_postgres_sql(sql: str) -> str:
+    """
+    Translate data server SQL to Postgres SQL: drop the data source prefix of the tables and
+    turn `$name` parameters into psycopg `%(name)s` placeholders.
+    """
+    sql = re.sub(rf"\b{DATASOURCE_NAME}\.", "", sql)
+    return re.sub(r"\$(\w+)", r"%(\1)s", sql.replace("%", "%%"))
+
+
+def get_pool(
+    postgres_url: Optional[str] = None,
+    max_size: int = DEFAULT_POOL_MAX_SIZE,
+    max_idle: float = DEFAULT_POOL_MAX_IDLE,
+):
+    """
+    The connection pool shared by all actions in the process, created on first use.
+    Returns None when no Postgres URL is configured.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    postgres_url = postgres_url or os.getenv(POSTGRES_URL_ENV)
+    if not postgres_url:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = build_pool(postgres_url, max_size=max_size, max_idle=max_idle)
+            atexit.register(close_pool)
+    return _pool
+
+
+def build_pool(
+    postgres_url: str,
+    max_size: int = DEFAULT_POOL_MAX_SIZE,
+    max_idle: float = DEFAULT_POOL_MAX_IDLE,
+    prepare: bool = True,
+):
+    from psycopg_pool import ConnectionPool
+
+    return ConnectionPool(
+        postgres_url,
+        min_size=1,
+        max_size=max_size,
+        max_idle=max_idle,
+        configure=configure_connection,
+        check=_check_connection,
+        reset=_mark_used,
+        kwargs={
+            "autocommit": True,
+            # Prepare every statement on its first execution on the connection (default: the 5th)
+            "prepare_threshold": 0 if prepare else None,
+            "application_name": "data-access-queries-template",
+        },
+        name=DATASOURCE_NAME,
+        open=True,
+    )
+
+
+def configure_connection(conn):
+    from psycopg.types.string import StrDumper
+
+    # Send strings as `text` instead of untyped: with server-side parameters Postgres can't
+    # infer the type of arguments like the `$company` in CONCAT('%', $company, '%')
+    conn.adapters.register_dumper(str, StrDumper)
+
+
+def _check_connection(conn):
+    # Raises if the connection is broken, the pool then replaces it with a new one
+    if time.monotonic() - _last_used.get(conn, 0.0) > CHECK_IDLE_AFTER:
+        from psycopg_pool import ConnectionPool
+
+        ConnectionPool.check_connection(conn)
+
+
+def _mark_used(conn):
+    # Called by the pool when the connection is given back
+    _last_used[conn] = time.monotonic()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -1,7 +1,10 @@
 from typing import Annotated
 from sema4ai.actions import ActionError, Response
 from sema4ai.data import DataSource, query
-from data_sources import FileSalesDataSource, PostgresCustomersDataSource
+from customers_pool import query_customers
+from data_sources import FileMonthlySalesDataSource, PostgresCustomersDataSource
+from result_render import render_result
+from sales_ingest import refresh_monthly_sales
 
 # The first query is simple select targeting only one data source and has one
 # parameter for country.
@@ -17,7 +20,7 @@ def get_customers_in_country(
         country: Name of the country in english, for example "France"
         datasource: The customer datasource.
     Returns:
-        Customers in the country as markdown.
+        Customers in the country as CSV.
     """
 
     sql = """
@@ -27,8 +30,8 @@ def get_customers_in_country(
         LIMIT 100;
     """
 
-    result = datasource.query(sql, params={"country": country})
-    return Response(result=result.to_markdown())
+    result = query_customers(datasource, sql, params={"country": country})
+    return Response(result=render_result(result))
 
 
 # The second query is more complex and shows a real-world scenario with data validation and error
@@ -38,7 +41,7 @@ def get_customers_in_country(
 @query
 def get_customers_orders_per_month(
     company_name: str,
-    datasource: Annotated[DataSource, FileSalesDataSource | PostgresCustomersDataSource]) -> Response[str]:
+    datasource: Annotated[DataSource, FileMonthlySalesDataSource | PostgresCustomersDataSource]) -> Response[str]:
     """
     Get one customer's aggregated order totals (sales) for all historic months.
 
@@ -46,7 +49,7 @@ def get_customers_orders_per_month(
         company_name: Company name or part of it like "GermanSys"
         datasource: The customer datasource.
     Returns:
-        Customers historic orders (sales) per month as markdown.
+        Customers historic orders (sales) per month as CSV.
         If more than one company is found with the name, the action returns the list of all found companies to choose from.
     """
 
@@ -57,30 +60,34 @@ def get_customers_orders_per_month(
         LIMIT 100;
     """
 
-    result = datasource.query(sql, params={"company": company_name})
+    result = query_customers(datasource, sql, params={"company": company_name})
 
-    number_of_rows = len(tuple(result.iter_as_tuples()))
+    number_of_rows = len(result)
     if number_of_rows == 0:
         raise ActionError("No companies found with our criteria")
 
     elif number_of_rows > 1:
-        raise ActionError(f"More than one company found with your criteria, here are all the found companies:\n\n{result.to_markdown()}")
+        raise ActionError(f"More than one company found with your criteria, here are all the found companies:\n\n{render_result(result, max_tokens=500)}")
 
     else:
+        # The sales file is append-only: fold the rows appended since the last query into the
+        # monthly totals instead of aggregating the whole file on every query.
+        refresh_monthly_sales()
+
         sql = """
             SELECT 
-                DATE_TRUNC('month', CAST(s.sale_date AS DATE)) as month,
-                ROUND(SUM(s.quantity_sold * s.price_per_unit), 2) as total_sales
-            FROM files.sales_data s
+                CAST(m.month AS DATE) as month,
+                ROUND(SUM(m.total_sales), 2) as total_sales
+            FROM files.sales_monthly m
             JOIN public_demo.demo_customers c
-                ON s.customer_id = c.customer_id
+                ON m.customer_id = c.customer_id
             WHERE c.company_name LIKE CONCAT('%', $company, '%')
-            GROUP BY DATE_TRUNC('month', CAST(s.sale_date AS DATE))
+            GROUP BY CAST(m.month AS DATE)
             ORDER BY 1;
         """
 
         result = datasource.query(sql, params={"company": company_name})
-        return Response(result=result.to_markdown())
+        return Response(result=render_result(result))
 
 # The base queries enable the Agent to guide the user
 @query
@@ -101,8 +108,8 @@ def get_countries(
         LIMIT 100;
     """
 
-    result = datasource.query(sql)
-    return Response(result=result.to_markdown())
+    result = query_customers(datasource, sql)
+    return Response(result=render_result(result))
 
 @query
 def get_customers(
@@ -122,5 +129,5 @@ def get_customers(
         LIMIT 100;
     """
 
-    result = datasource.query(sql)
-    return Response(result=result.to_markdown())
+    result = query_customers(datasource, sql)
+    return Response(result=render_result(result))
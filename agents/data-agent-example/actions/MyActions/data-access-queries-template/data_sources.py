@@ -15,6 +15,18 @@ FileSalesDataSource = Annotated[
     ),
 ]
 
+# Monthly sales totals per customer, kept up to date incrementally from files/sales_data.csv
+# by sales_ingest.py (only the rows appended since the last refresh are read).
+FileMonthlySalesDataSource = Annotated[
+    DataSource,
+    DataSourceSpec(
+        created_table="sales_monthly",
+        file="files/sales_monthly.csv",  # Path relative to the data package root
+        engine="files",  # Using the files engine
+        description="Monthly sales totals per customer from 2023-2024.",
+    ),
+]
+
 PostgresCustomersDataSource = Annotated[
     DataSource,
     DataSourceSpec(
@@ -0,0 +1,77 @@
+"""
+Compares `render_result` with `ResultSet.to_markdown()` on generated sales-like results.
+
+    python devdata/benchmark_render.py --rows 10000 --repeat 20
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from sema4ai.data import ResultSet
+
+from result_render import CHARS_PER_TOKEN, DEFAULT_MAX_TOKENS, render_result
+
+COLUMNS = ["sale_id", "sale_date", "customer_id", "company_name", "country", "quantity_sold", "total_sales"]
+
+
+def build_result(rows: int) -> ResultSet:
+    # Values as they come back from the data server (`to_markdown` only accepts JSON types)
+    rng = random.Random(42)
+    companies = [f"Company {i} Ltd" for i in range(300)]
+    start = date(2023, 1, 1)
+    data = []
+    for i in range(rows):
+        customer_id = rng.randrange(len(companies))
+        quantity = rng.randint(1, 20)
+        data.append([
+            i + 1,
+            (start + timedelta(days=rng.randrange(730))).isoformat(),
+            customer_id,
+            companies[customer_id],
+            "France",
+            quantity,
+            round(quantity * rng.randint(100, 99999) / 100, 2),
+        ])
+    return ResultSet(COLUMNS, data)
+
+
+def measure(render, repeat: int):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = render()
+        durations.append(time.perf_counter() - start)
+    return output, statistics.median(durations) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    args = parser.parse_args(argv)
+
+    result = build_result(args.rows)
+    renderers = {
+        "to_markdown": result.to_markdown,
+        f"render_result({args.max_tokens} tokens)": lambda: render_result(result, args.max_tokens),
+        "render_result(unbounded)": lambda: render_result(result, max_tokens=10**9),
+    }
+    print(f"{args.rows} rows x {len(COLUMNS)} columns, median of {args.repeat} runs")
+    for name, render in renderers.items():
+        output, median_ms = measure(render, args.repeat)
+        print(
+            f"\t{name}: {median_ms:.1f}ms, {len(output)} chars (~{len(output) // CHARS_PER_TOKEN} tokens), "
+            f"{output.count(chr(10)) + 1} lines"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+The result_render.py renders query results for the LLM within a token budget.
+
+`ResultSet.to_markdown()` pads every cell to the widest value of its column and returns all the
+rows, however many there are. `render_result` instead writes the rows as CSV until the budget is
+used and only keeps the rows shown and running stats of each column, whatever the result size:
+
+    # 10000 rows; same in all rows: country=France
+    company_name,sale_date,total_sales
+    Acme,2023-01-01,221.9
+    ...
+    # 9880 more rows not shown (120 of 10000 shown)
+    # company_name: 812 distinct values
+    # total_sales: min=1.5, max=980.25, mean=120.4
+
+Columns that hold the same value in every row are pruned from the CSV and listed once in the
+header, and the budget they would have used goes to more rows. When rows are cut, the trailer gives the number of missing rows and summary stats of each
+column computed over all the rows.
+"""
+
+import csv
+import io
+from decimal import Decimal
+from typing import Any, Iterable, List, Sequence
+
+from sema4ai.data import ResultSet
+
+# Rough number of characters per LLM token for CSV-like text
+CHARS_PER_TOKEN = 4
+DEFAULT_MAX_TOKENS = 2000
+# Rows per batch of column stats updates
+STATS_CHUNK_ROWS = 1024
+
+_NUMBER_TYPES = (int, float, Decimal)
+
+
+def render_result(result: ResultSet, max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+    """
+    Render the query result as compact CSV within `max_tokens` (approximately).
+    """
+    # The public accessors either collapse duplicated column names (row dicts) or validate every
+    # cell (`to_table()`, used by `to_markdown()`), so the column list and the row tuples of the
+    # result set are read positionally.
+    return render_rows(list(result._columns), result.iter_as_tuples(), max_tokens)
+
+
+def render_rows(columns: Sequence[str], rows: Iterable[Sequence[Any]], max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+    budget = max_tokens * CHARS_PER_TOKEN
+    # Room kept for the header and trailer lines written after the rows
+    row_budget = budget - min(budget // 2, 80 + 48 * len(columns))
+
+    # Rows are formatted only while they fit in the budget, the others only update the stats.
+    # Columns that have held a single value so far may be pruned from the CSV, so they are not
+    # charged: when a column gets a second value, its cells in the rows shown so far are charged
+    # and the last rows are dropped until the shown rows fit again.
+    stats = [_ColumnStats() for _ in columns]
+    constant = [True] * len(columns)
+    candidates = list(range(len(columns)))
+    first_row: Sequence[Any] = ()
+    shown: List[List[str]] = []
+    used = 0
+    full = False
+    total = 0
+
+    def charge(i: int):
+        nonlocal used, full
+        constant[i] = False
+        candidates.remove(i)
+        # Until now the column held the value of the first row in all the shown rows
+        used += _csv_len(str(columns[i])) + 1
+        if shown:
+            used += len(shown) * (_csv_len(_format_value(first_row[i])) + 1)
+        while shown and used > row_budget:
+            full = True
+            values = shown.pop()
+            used -= sum(_csv_len(values[j]) + 1 for j in range(len(columns)) if not constant[j])
+
+    def add_stats(chunk: List[Sequence[Any]]):
+        for i, values in enumerate(zip(*chunk)):
+            stats[i].add_all(values)
+            if constant[i] and values.count(first_row[i]) != len(values):
+                charge(i)
+
+    # The stats are updated column-wise on chunks of rows, which is much faster than per cell
+    chunk: List[Sequence[Any]] = []
+    for row in rows:
+        total += 1
+        if total == 1:
+            first_row = row
+        elif not full:
+            # Checked on each shown row so that it's charged right away, the other rows are
+            # checked with their chunk
+            for i in [i for i in candidates if not row[i] == first_row[i]]:
+                charge(i)
+        chunk.append(row)
+        if len(chunk) == STATS_CHUNK_ROWS:
+            add_stats(chunk)
+            chunk = []
+        if full:
+            continue
+        values = [_format_value(v) for v in row]
+        size = sum(_csv_len(v) + 1 for v in values) - sum(_csv_len(values[i]) + 1 for i in candidates)
+        # The count bounds the rows kept while all the columns are still constant
+        if used + size > row_budget or len(shown) >= row_budget:
+            full = True
+            continue
+        used += size
+        shown.append(values)
+    if chunk:
+        add_stats(chunk)
+
+    # Columns with a single value across several rows are listed once instead of in every row
+    pruned = [i for i in range(len(columns)) if constant[i]] if total > 1 else []
+    if len(pruned) == len(columns):
+        pruned = []
+    for i in [i for i in candidates if i not in pruned]:
+        charge(i)
+    kept = [i for i in range(len(columns)) if i not in pruned]
+
+    out = io.StringIO()
+    if pruned:
+        constants = ", ".join(
+            f"{columns[i]}={_format_value(first_row[i])}" if first_row[i] is not None else f"{columns[i]} empty"
+            for i in pruned
+        )
+        out.write(f"# {total} rows; same in all rows: {constants}\n")
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow([columns[i] for i in kept])
+    for values in shown:
+        writer.writerow([values[i] for i in kept])
+
+    if total == 0:
+        out.write("# 0 rows\n")
+    elif len(shown) < total:
+        out.write(f"# {total - len(shown)} more rows not shown ({len(shown)} of {total} shown)\n")
+        for i in kept:
+            summary = stats[i].summary()
+            if summary:
+                out.write(f"# {columns[i]}: {summary}\n")
+    return out.getvalue().rstrip("\n")
+
+
+class _ColumnStats:
+    """Running summary of the values of a column: min/max/mean of the numbers, distinct count
+    of the other values and number of empty values."""
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.numbers = 0
+        self.minimum: Any = None
+        self.maximum: Any = None
+        self.sum: Any = 0
+        self.distinct: set = set()
+
+    def add_all(self, values: Sequence[Any]):
+        self.count += len(values)
+        nulls = values.count(None)
+        self.nulls += nulls
+        types = set(map(type, values))
+        types.discard(type(None))
+        if types.issubset(_NUMBER_TYPES):
+            numbers, others = [v for v in values if v is not None] if nulls else values, ()
+        elif str in types and len(types) == 1:
+            numbers, others = (), [v for v in values if v is not None] if nulls else values
+        else:
+            numbers = [v for v in values if _is_number(v)]
+            others = [v for v in values if v is not None and not _is_number(v)]
+        if numbers:
+            self.numbers += len(numbers)
+            try:
+                minimum, maximum, total = min(numbers), max(numbers), sum(numbers)
+                if self.minimum is not None:
+                    minimum, maximum = min(minimum, self.minimum), max(maximum, self.maximum)
+                self.sum += total
+            except TypeError:  # Mixed number types (e.g. Decimal and float)
+                floats = [float(v) for v in numbers]
+                minimum, maximum = min(floats), max(floats)
+                if self.minimum is not None:
+                    minimum, maximum = min(minimum, float(self.minimum)), max(maximum, float(self.maximum))
+                self.sum = float(self.sum) + sum(floats)
+            self.minimum, self.maximum = minimum, maximum
+        try:
+            self.distinct.update(others)
+        except TypeError:  # Unhashable values (e.g. JSON lists)
+            for v in others:
+                try:
+                    self.distinct.add(v)
+                except TypeError:
+                    self.distinct.add(repr(v))
+
+    def summary(self) -> str:
+        parts = []
+        if self.numbers:
+            mean = self.sum / self.numbers
+            parts.append(f"min={float(self.minimum):.10g}, max={float(self.maximum):.10g}, mean={float(mean):.10g}")
+        if self.distinct:
+            other = " non-numeric" if self.numbers else ""
+            parts.append(f"{len(self.distinct)} distinct{other} values")
+        if self.nulls:
+            parts.append(f"{self.nulls} empty")
+        return ", ".join(parts)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, _NUMBER_TYPES) and not isinstance(value, bool)
+
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        return f"{value:.10g}"
+    return str(value)
+
+
+def _csv_len(value: str) -> int:
+    # Length of the value once written by the csv writer (quoted when it has special characters)
+    if "," in value or '"' in value or "\n" in value or "\r" in value:
+        return len(value) + 2 + value.count('"')
+    return len(value)
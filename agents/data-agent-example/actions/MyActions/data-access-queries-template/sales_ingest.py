@@ -0,0 +1,257 @@
+"""
+The sales_ingest.py keeps the monthly sales table (files/sales_monthly.csv) in sync with the
+append-only sales file (files/sales_data.csv) without re-reading the whole sales file.
+
+The ingestion state (files/.sales_ingest_state.json) holds the monthly totals together with how
+far the sales file has been ingested (byte offset and row count) and hashes of the file header and
+of the bytes just before the offset. On refresh only the rows appended after the offset are parsed
+and added to the totals. If the file shrank or the hashed bytes changed, earlier rows were edited
+and the table is rebuilt from scratch.
+
+Refreshes take an exclusive lock (files/.sales_ingest.lock), so concurrent actions, threads or
+processes never ingest the same rows twice. The state is the source of truth and is replaced
+atomically as a whole; the monthly table is written from it before each state update.
+
+    python sales_ingest.py           # incremental refresh
+    python sales_ingest.py --rebuild # full rebuild
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from sema4ai.actions import ActionError
+
+FILES_DIR = Path(__file__).absolute().parent / "files"
+SALES_FILE = FILES_DIR / "sales_data.csv"
+MONTHLY_FILE = FILES_DIR / "sales_monthly.csv"
+STATE_FILE = FILES_DIR / ".sales_ingest_state.json"
+
+# How long a refresh waits for another one to finish before giving up
+LOCK_TIMEOUT_SECONDS = 120.0
+
+# Size of the windows hashed at the start of the file and right before the ingested offset
+HASH_WINDOW_BYTES = 64 * 1024
+
+SALES_COLUMNS = ["sale_id", "item_id", "sale_date", "quantity_sold", "price_per_unit", "customer_id"]
+MONTHLY_COLUMNS = ["month", "customer_id", "total_sales", "quantity_sold", "sales_count"]
+
+MonthlyKey = Tuple[str, str]
+
+
+@dataclass
+class IngestState:
+    offset: int
+    rows: int
+    head_hash: str
+    tail_hash: str
+    totals: Dict[MonthlyKey, list]
+
+
+@dataclass
+class RefreshResult:
+    mode: str  # "unchanged", "incremental" or "rebuild"
+    new_rows: int
+    total_rows: int
+    bytes_read: int
+
+
+def refresh_monthly_sales(
+    sales_file: Path = SALES_FILE,
+    monthly_file: Path = MONTHLY_FILE,
+    state_file: Path = STATE_FILE,
+    rebuild: bool = False,
+) -> RefreshResult:
+    """
+    Bring the monthly sales table up to date with the rows appended to the sales file since the
+    last refresh, rebuilding it when earlier bytes of the sales file changed.
+    """
+    with _file_lock(state_file.with_name(".sales_ingest.lock")):
+        state = None if rebuild else _load_state(state_file)
+        size = os.path.getsize(sales_file)
+
+        with open(sales_file, "rb") as f:
+            if state and _is_prefix_unchanged(f, size, state):
+                if size == state.offset:
+                    if not monthly_file.exists():
+                        _write_monthly(monthly_file, state.totals)
+                    return RefreshResult("unchanged", 0, state.rows, 0)
+                totals = state.totals
+                f.seek(state.offset)
+                new_rows, consumed = _ingest(f.read(size - state.offset), totals)
+                mode, offset, rows = "incremental", state.offset + consumed, state.rows + new_rows
+            else:
+                totals = {}
+                f.seek(0)
+                header = f.readline()
+                new_rows, consumed = _ingest(f.read(size - len(header)), totals)
+                mode, offset, rows = "rebuild", len(header) + consumed, new_rows
+            head_hash, tail_hash = _window_hashes(f, offset)
+
+        # The table is only derived from the state: if the process dies between the two writes,
+        # the next refresh starts again from the previous state and rewrites the table.
+        _write_monthly(monthly_file, totals)
+        _save_state(state_file, IngestState(offset, rows, head_hash, tail_hash, totals))
+    return RefreshResult(mode, new_rows, rows, offset if mode == "rebuild" else consumed)
+
+
+def _ingest(data: bytes, totals: Dict[MonthlyKey, list]) -> Tuple[int, int]:
+    """
+    Add the complete lines of `data` to the totals. A trailing line without a newline may still
+    be being written, so it is left for the next refresh.
+    Returns the number of rows and bytes consumed.
+    """
+    consumed = data.rfind(b"\n") + 1
+    rows = 0
+    for record in csv.reader(io.StringIO(data[:consumed].decode("utf-8"))):
+        if not record:  # Blank line
+            continue
+        if len(record) != len(SALES_COLUMNS):
+            raise ActionError(
+                f"Unexpected row in {SALES_FILE.name}: expected {len(SALES_COLUMNS)} columns "
+                f"({', '.join(SALES_COLUMNS)}) but got {len(record)}: {record!r}"
+            )
+        sale_id, item_id, sale_date, quantity_sold, price_per_unit, customer_id = record
+        key = (f"{sale_date[:7]}-01", customer_id)
+        monthly = totals.setdefault(key, [Decimal(0), 0, 0])
+        monthly[0] += int(quantity_sold) * Decimal(price_per_unit)
+        monthly[1] += int(quantity_sold)
+        monthly[2] += 1
+        rows += 1
+    return rows, consumed
+
+
+def _window_hashes(f, offset: int) -> Tuple[str, str]:
+    f.seek(0)
+    head = hashlib.sha256(f.read(min(offset, HASH_WINDOW_BYTES))).hexdigest()
+    start = max(0, offset - HASH_WINDOW_BYTES)
+    f.seek(start)
+    tail = hashlib.sha256(f.read(offset - start)).hexdigest()
+    return head, tail
+
+
+def _is_prefix_unchanged(f, size: int, state: IngestState) -> bool:
+    if size < state.offset:
+        return False
+    return _window_hashes(f, state.offset) == (state.head_hash, state.tail_hash)
+
+
+def _write_monthly(monthly_file: Path, totals: Dict[MonthlyKey, list]):
+    def write(f):
+        writer = csv.writer(f)
+        writer.writerow(MONTHLY_COLUMNS)
+        for (month, customer_id), (total_sales, quantity_sold, sales_count) in sorted(
+            totals.items(), key=lambda item: (item[0][0], int(item[0][1]))
+        ):
+            writer.writerow([month, customer_id, total_sales, quantity_sold, sales_count])
+
+    # Written to a temporary file first so the data server never sees a half-written table
+    _replace_atomically(monthly_file, write)
+
+
+def _load_state(state_file: Path) -> Optional[IngestState]:
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        totals = {
+            (month, customer_id): [Decimal(total_sales), quantity_sold, sales_count]
+            for month, customer_id, total_sales, quantity_sold, sales_count in data["totals"]
+        }
+        return IngestState(data["offset"], data["rows"], data["head_hash"], data["tail_hash"], totals)
+    except (OSError, ValueError, TypeError, KeyError, ArithmeticError):
+        return None
+
+
+def _save_state(state_file: Path, state: IngestState):
+    data = {
+        "offset": state.offset,
+        "rows": state.rows,
+        "head_hash": state.head_hash,
+        "tail_hash": state.tail_hash,
+        "totals": [
+            [month, customer_id, str(total_sales), quantity_sold, sales_count]
+            for (month, customer_id), (total_sales, quantity_sold, sales_count) in state.totals.items()
+        ],
+    }
+    _replace_atomically(state_file, lambda f: json.dump(data, f))
+
+
+def _replace_atomically(target: Path, write):
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            write(f)
+        os.replace(tmp_name, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def _file_lock(lock_file: Path, timeout: float = LOCK_TIMEOUT_SECONDS):
+    """
+    Exclusive lock shared by all threads and processes refreshing the same files.
+    Raises ActionError if the lock is still held by another refresh after `timeout` seconds.
+    """
+    if os.name == "nt":
+        import msvcrt
+
+        def try_lock(f) -> bool:
+            try:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)  # Locks the first byte
+                return True
+            except OSError:
+                return False
+
+        def unlock(f):
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+
+        def try_lock(f) -> bool:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                return False
+
+        def unlock(f):
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    with open(lock_file, "a+b") as f:
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        while not try_lock(f):
+            if time.monotonic() >= deadline:
+                raise ActionError(
+                    f"Timed out after {timeout:g}s waiting for another sales refresh to release {lock_file}"
+                )
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        try:
+            yield
+        finally:
+            unlock(f)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh files/sales_monthly.csv from files/sales_data.csv")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the monthly table from scratch")
+    result = refresh_monthly_sales(rebuild=parser.parse_args().rebuild)
+    print(f"{result.mode}: {result.new_rows} new rows ({result.bytes_read} bytes read), {result.total_rows} rows in total")
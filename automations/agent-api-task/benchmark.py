@@ -0,0 +1,258 @@
+"""
+Open-loop load test of an agent through the Agent API.
+
+Prompts in the `devdata/work-items-in` format are replayed at a fixed request rate,
+independently of how fast the agent answers, so queueing shows up in the latencies.
+Each request creates a conversation and sends the prompt (streamed if the payload has
+`stream: true`). Results are saved as JSON to compare runs against each other:
+
+    python benchmark.py --stub --rate 20 --requests 200
+    python benchmark.py --rate 2 --requests 50 --baseline output/benchmark-previous.json
+
+Without `--stub` the Agent API credentials are read from AGENT_ENDPOINT_URL, AGENT_API_KEY
+and AGENT_ID, or from the `agent_api` vault secret.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tasks import Sema4APIClient, _percentile, _run_conversation
+
+PACKAGE_DIR = Path(__file__).absolute().parent
+DEFAULT_PROMPTS = PACKAGE_DIR / "devdata" / "work-items-in"
+
+# Upper bounds (ms) of the latency histogram buckets, the last bucket is unbounded
+HISTOGRAM_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000]
+
+
+def load_prompts(path: Path) -> List[dict]:
+    """
+    Load work item payloads from a work-items.json file or from all work-items.json files under a directory
+    """
+    path = Path(path)
+    files = sorted(path.rglob("work-items.json")) if path.is_dir() else [path]
+    payloads = []
+    for file in files:
+        with open(file, "r", encoding="utf-8") as f:
+            payloads.extend(item.get("payload") or {} for item in json.load(f))
+    if not payloads:
+        raise ValueError(f"No work items found in {path}")
+    return payloads
+
+
+def run_benchmark(
+    client: Sema4APIClient,
+    payloads: List[dict],
+    rate: float,
+    requests: int,
+    max_in_flight: int = 64,
+    poisson: bool = False,
+) -> dict:
+    """
+    Send `requests` conversations at `rate` requests per second (evenly spaced, or with
+    exponentially distributed gaps when `poisson` is set) and return the results summary
+
+    Latency is measured from the scheduled send time: when all `max_in_flight` workers are
+    busy the waiting time counts against the agent, as it would for real users.
+    """
+    results: List[dict] = []
+    results_lock = threading.Lock()
+
+    def send(payload: dict, scheduled: float):
+        started = time.perf_counter()
+        result = _run_conversation(client, payload)
+        result["latency_seconds"] = time.perf_counter() - scheduled
+        result["service_time_seconds"] = time.perf_counter() - started
+        with results_lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    scheduled = start
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for i in range(requests):
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, payloads[i % len(payloads)], scheduled)
+            scheduled += random.expovariate(rate) if poisson else 1 / rate
+    elapsed = time.perf_counter() - start
+
+    return summarize(results, elapsed, {
+        "rate": rate,
+        "requests": requests,
+        "max_in_flight": max_in_flight,
+        "arrivals": "poisson" if poisson else "uniform",
+        "prompts": len(payloads),
+        "endpoint_url": client.endpoint_url,
+    })
+
+
+def summarize(results: List[dict], elapsed: float, config: dict) -> dict:
+    succeeded = [r for r in results if r["status"] == "success"]
+    latencies_ms = [r["latency_seconds"] * 1000 for r in succeeded]
+    service_ms = [r["service_time_seconds"] * 1000 for r in succeeded]
+    first_ms = [
+        r["time_to_first_message_seconds"] * 1000
+        for r in succeeded
+        if r.get("time_to_first_message_seconds") is not None
+    ]
+    action_calls = Counter()
+    message_types = Counter()
+    for result in succeeded:
+        for msg in result.get("messages", []):
+            message_types[msg.get("type")] += 1
+            if msg.get("type") == "action_request":
+                action_calls.update(act["name"] for act in msg.get("action_calls", []))
+    errors = Counter(r["error"].split(":", 1)[0] for r in results if r["status"] != "success")
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": config,
+        "duration_seconds": elapsed,
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "error_rate": (len(results) - len(succeeded)) / len(results) if results else 0.0,
+        "achieved_rate": len(results) / elapsed if elapsed else 0.0,
+        "latency_ms": _stats(latencies_ms),
+        "service_time_ms": _stats(service_ms),
+        "time_to_first_message_ms": _stats(first_ms),
+        "latency_histogram_ms": _histogram(latencies_ms),
+        "action_calls": dict(action_calls.most_common()),
+        "message_types": dict(message_types.most_common()),
+        "errors": dict(errors.most_common()),
+    }
+
+
+def _stats(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values),
+        "p50": _percentile(values, 50),
+        "p90": _percentile(values, 90),
+        "p99": _percentile(values, 99),
+        "max": values[-1],
+    }
+
+
+def _histogram(values: List[float]) -> Dict[str, int]:
+    histogram = {f"<={bound}": 0 for bound in HISTOGRAM_BUCKETS_MS}
+    histogram[f">{HISTOGRAM_BUCKETS_MS[-1]}"] = 0
+    for value in values:
+        bound = next((b for b in HISTOGRAM_BUCKETS_MS if value <= b), None)
+        histogram[f"<={bound}" if bound is not None else f">{HISTOGRAM_BUCKETS_MS[-1]}"] += 1
+    return histogram
+
+
+def print_summary(summary: dict, baseline: Optional[dict] = None):
+    print(
+        f"{summary['requests']} requests in {summary['duration_seconds']:.1f}s "
+        f"(target {summary['config']['rate']}/s, achieved {summary['achieved_rate']:.2f}/s), "
+        f"error rate {summary['error_rate']:.1%}"
+    )
+    for name in ("latency_ms", "service_time_ms", "time_to_first_message_ms"):
+        stats = summary[name]
+        if not stats:
+            continue
+        line = f"\t{name}: " + " ".join(f"{key}={stats[key]:.1f}" for key in ("p50", "p90", "p99", "max"))
+        if baseline and baseline.get(name):
+            line += "  (vs baseline: " + " ".join(
+                f"{key} {_change(stats[key], baseline[name][key])}" for key in ("p50", "p90", "p99")
+            ) + ")"
+        print(line)
+    if baseline:
+        print(f"\terror rate vs baseline: {summary['error_rate'] - baseline['error_rate']:+.1%}")
+    print(f"\tlatency histogram: {summary['latency_histogram_ms']}")
+    print(f"\taction calls: {summary['action_calls']}")
+    if summary["errors"]:
+        print(f"\terrors: {summary['errors']}")
+
+
+def _change(value: float, baseline_value: float) -> str:
+    if not baseline_value:
+        return "n/a"
+    return f"{(value - baseline_value) / baseline_value:+.0%}"
+
+
+def save_summary(summary: dict, output: Path):
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Benchmark results saved to {output}")
+
+
+def start_stub(pool_size: int, **kwargs):
+    """
+    Start the bundled stub of the Agent API (devdata/stub_agent_api.py) and return a client for it
+    """
+    sys.path.insert(0, str(PACKAGE_DIR / "devdata"))
+    from stub_agent_api import serve
+
+    server, _ = serve(**kwargs)
+    client = Sema4APIClient(
+        "agent-1", api_key="stub", endpoint_url=f"http://127.0.0.1:{server.server_port}", pool_size=pool_size
+    )
+    return server, client
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prompts", type=Path, default=DEFAULT_PROMPTS, help="work-items.json file or directory of them")
+    parser.add_argument("--rate", type=float, default=1.0, help="Target requests per second")
+    parser.add_argument("--requests", type=int, default=20, help="Number of requests to send")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Maximum concurrent requests")
+    parser.add_argument("--poisson", action="store_true", help="Exponentially distributed gaps between requests")
+    parser.add_argument("--output", type=Path, default=Path(os.getenv("ROBOT_ARTIFACTS", "output")) / "benchmark.json")
+    parser.add_argument("--baseline", type=Path, help="Earlier results to compare against")
+    parser.add_argument("--stub", action="store_true", help="Run against the bundled local stub of the Agent API")
+    parser.add_argument("--stub-message-delay", type=float, default=0.05, help="Stub agent seconds per reply message")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.stub:
+        server, client = start_stub(args.max_in_flight, message_delay=args.stub_message_delay)
+    elif os.getenv("AGENT_ENDPOINT_URL") and os.getenv("AGENT_API_KEY"):
+        client = Sema4APIClient(
+            os.getenv("AGENT_ID"),
+            api_key=os.getenv("AGENT_API_KEY"),
+            endpoint_url=os.getenv("AGENT_ENDPOINT_URL"),
+            pool_size=args.max_in_flight,
+        )
+    else:
+        client = Sema4APIClient(pool_size=args.max_in_flight)
+
+    try:
+        summary = run_benchmark(
+            client, load_prompts(args.prompts), args.rate, args.requests, args.max_in_flight, args.poisson
+        )
+    finally:
+        if server:
+            server.shutdown()
+        client.close()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+    save_summary(summary, args.output)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
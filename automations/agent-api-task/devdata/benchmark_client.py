@@ -0,0 +1,63 @@
+"""
+Benchmarks the pooled Sema4APIClient against plain module-level `sema4ai_http` calls
+using the local stub of the Agent API.
+
+    python devdata/benchmark_client.py --requests 500 --threads 8
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sema4ai_http import get, post
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+sys.path.insert(0, str(Path(__file__).absolute().parent))
+
+from stub_agent_api import serve  # noqa: E402
+from tasks import Sema4APIClient  # noqa: E402
+
+
+def run_plain(endpoint_url: str, headers: dict, i: int):
+    response = post(f"{endpoint_url}/api/v1/agents/agent-1/conversations", headers=headers, json={"name": f"bench {i}"})
+    response.raise_for_status()
+    conversation_id = response.json()["id"]
+    post(
+        f"{endpoint_url}/api/v1/agents/agent-1/conversations/{conversation_id}/messages",
+        headers=headers, json={"content": "hello"},
+    ).raise_for_status()
+    get(f"{endpoint_url}/api/v1/agents", headers=headers).raise_for_status()
+
+
+def run_client(client: Sema4APIClient, i: int):
+    conversation_id = client.create_conversation(f"bench {i}")
+    client.send_message(conversation_id, "hello")
+    client.get_agents()
+
+
+def measure(label: str, func, requests: int, threads: int):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(func, range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {requests * 3 / elapsed:>10.0f} req/s  ({elapsed:.2f}s for {requests * 3} requests)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="Conversations to create (3 requests each)")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub latency per request in seconds")
+    args = parser.parse_args()
+
+    server, _ = serve(latency=args.latency)
+    endpoint_url = f"http://127.0.0.1:{server.server_port}"
+    client = Sema4APIClient("agent-1", api_key="bench", endpoint_url=endpoint_url, pool_size=args.threads)
+
+    for threads in sorted({1, args.threads}):
+        measure(f"plain get/post x{threads}", lambda i: run_plain(endpoint_url, client.headers, i), args.requests, threads)
+        measure(f"Sema4APIClient x{threads}", lambda i: run_client(client, i), args.requests, threads)
+    client.print_latency_report()
+    server.shutdown()
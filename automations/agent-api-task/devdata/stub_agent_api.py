@@ -0,0 +1,144 @@
+"""
+Local stub of the Sema4.ai Agent API (`/api/v1/agents` endpoints) for offline testing and benchmarking.
+
+    python devdata/stub_agent_api.py --port 8000 --latency 0.05
+
+Point the client to it with AGENT_ENDPOINT_URL=http://127.0.0.1:8000 (any API key is accepted).
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubAgentAPI:
+    def __init__(self, agents=None, latency: float = 0.0, page_size: int = 50, message_delay: float = 0.0):
+        self.agents = agents or [
+            {"id": "agent-1", "name": "Greeter Agent"},
+            {"id": "agent-2", "name": "Files Agent"},
+        ]
+        self.latency = latency
+        self.page_size = page_size
+        self.message_delay = message_delay
+        self.conversations = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def next_id(self, prefix: str) -> str:
+        with self.lock:
+            return f"{prefix}-{next(self._ids)}"
+
+    def reply(self, prompt: str) -> list:
+        return [
+            {"type": "action_request", "content": "", "action_calls": [{"name": "greet"}]},
+            {"type": "action_response", "content": "", "status": "success"},
+            {"type": "agent", "content": f"You said: {prompt}"},
+        ]
+
+
+def make_handler(state: StubAgentAPI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, messages: list):
+            """Server-sent events over a chunked response, one event per message."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            events = [f"event: message\ndata: {json.dumps(m)}\n\n" for m in messages] + ["event: done\ndata: {}\n\n"]
+            try:
+                for i, event in enumerate(events):
+                    if i and state.message_delay:
+                        time.sleep(state.message_delay)
+                    data = event.encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading the stream
+                self.close_connection = True
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _parts(self):
+            with state.lock:
+                state.requests += 1
+            if state.latency:
+                time.sleep(state.latency)
+            return urlparse(self.path).path.strip("/").split("/")
+
+        def do_GET(self):
+            parts = self._parts()
+            if parts == ["api", "v1", "agents"]:
+                query = parse_qs(urlparse(self.path).query)
+                start = int(query.get("next", ["0"])[0])
+                end = start + int(query.get("limit", [state.page_size])[0])
+                has_more = end < len(state.agents)
+                self._send(200, {"data": state.agents[start:end], "next": str(end) if has_more else None, "has_more": has_more})
+            else:
+                self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            parts = self._parts()
+            payload = self._read_json()
+            if len(parts) == 5 and parts[:3] == ["api", "v1", "agents"] and parts[4] == "conversations":
+                conversation_id = state.next_id("conversation")
+                with state.lock:
+                    state.conversations[conversation_id] = {"agent_id": parts[3], "name": payload.get("name")}
+                self._send(200, {"id": conversation_id, "name": payload.get("name")})
+            elif len(parts) in (7, 8) and parts[:3] == ["api", "v1", "agents"] and parts[6] == "messages":
+                if parts[5] not in state.conversations:
+                    self._send(404, {"error": "Conversation not found"})
+                    return
+                messages = state.reply(payload.get("content", ""))
+                if len(parts) == 8 and parts[7] == "stream":
+                    self._send_stream(messages)
+                else:
+                    if state.message_delay:
+                        time.sleep(state.message_delay * len(messages))
+                    self._send(200, {"messages": messages})
+            else:
+                self._send(404, {"error": "Not found"})
+
+    return Handler
+
+
+def serve(port: int = 0, **kwargs):
+    """Starts the stub in a background thread and returns (server, state)."""
+    state = StubAgentAPI(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--page-size", type=int, default=50, help="Agents per page in the agent listing")
+    parser.add_argument("--message-delay", type=float, default=0.0, help="Seconds the agent takes per reply message")
+    args = parser.parse_args()
+    state = StubAgentAPI(latency=args.latency, page_size=args.page_size, message_delay=args.message_delay)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"Stub Agent API listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -1,112 +1,471 @@
+import json
+import math
+import os
+import shlex
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+import urllib3
 from robocorp.tasks import task
 from robocorp import vault, workitems
-from typing import Optional, List, Dict
-from sema4ai_http import get, post
+from typing import Optional, List, Dict, Iterator
+from urllib.parse import urlencode
+from sema4ai_http import ResponseWrapper, build_ssl_context, get_network_profile
 
 DEFAULT_CONVERSATION_NAME = "Test Conversation"
 DEFAULT_PROMPT = "Download https://cdn.robocorp.com/security/security-and-data-protection-whitepaper.pdf and attach it to fileswith name whitepaper.pdf"
 
+# HTTP client tuning, can be overridden with environment variables
+DEFAULT_POOL_SIZE = int(os.getenv("AGENT_API_POOL_SIZE", "10"))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("AGENT_API_CONNECT_TIMEOUT", "10"))
+# Sending a message blocks until the agent has fully answered, which may take minutes
+DEFAULT_READ_TIMEOUT = float(os.getenv("AGENT_API_READ_TIMEOUT", "600"))
+DEFAULT_MAX_RETRIES = int(os.getenv("AGENT_API_MAX_RETRIES", "3"))
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Number of work items processed in parallel by create_agent_conversations_batch
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "8"))
+
+# How long the agent name to ID index is trusted before the agent listing is fetched again
+AGENT_INDEX_TTL = float(os.getenv("AGENT_INDEX_TTL", "300"))
+# Minimum time between two agent listings fetched because a name was not in the index
+AGENT_INDEX_MISS_REFRESH = float(os.getenv("AGENT_INDEX_MISS_REFRESH", "5"))
+
 
 class Sema4APIClient:
-    def __init__(self, agent_id: str = None):
-        secrets = vault.get_secret("agent_api")
-        self.agent_id = agent_id if agent_id else secrets["AGENT_ID"]
-        self.api_key = secrets["AGENT_API_KEY"]
-        self.endpoint_url = secrets["AGENT_ENDPOINT_URL"].rstrip('/')
+    def __init__(
+        self,
+        agent_id: str = None,
+        api_key: str = None,
+        endpoint_url: str = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
+        secrets = vault.get_secret("agent_api") if not (api_key and endpoint_url) else {}
+        self.agent_id = agent_id if agent_id else secrets.get("AGENT_ID")
+        self.api_key = api_key if api_key else secrets["AGENT_API_KEY"]
+        self.endpoint_url = (endpoint_url if endpoint_url else secrets["AGENT_ENDPOINT_URL"]).rstrip('/')
         self.headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
+        self.timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        # GETs are idempotent and retried on connection errors and on throttling/server errors.
+        self.get_retries = urllib3.Retry(
+            total=max_retries,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            backoff_jitter=RETRY_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # POSTs are only retried when the connection could not be made (the request never reached the server).
+        self.post_retries = urllib3.Retry(
+            total=max_retries, connect=max_retries, read=0, status=0, other=0,
+            backoff_factor=RETRY_BACKOFF_FACTOR, allowed_methods=False,
+        )
+        self.pool = _build_pool_manager(pool_size)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        # Per streamed conversation: time to first message and time to completion in seconds
+        self.stream_timings: Dict[str, dict] = {}
+        self._latencies_lock = threading.Lock()
 
-    def _make_get(self, endpoint: str) -> dict:
+    def _request(self, method: str, endpoint: str, metric: str, **kwargs) -> ResponseWrapper:
         url = f"{self.endpoint_url}{endpoint}"
-        response = get(url, headers=self.headers)
+        start = time.perf_counter()
+        try:
+            response = ResponseWrapper(self.pool.request(method, url, headers=self.headers, timeout=self.timeout, **kwargs))
+        finally:
+            with self._latencies_lock:
+                self.latencies[f"{method} {metric}"].append(time.perf_counter() - start)
+        response.raise_for_status()
+        return response
+
+    def _make_get(self, endpoint: str, metric: Optional[str] = None) -> dict:
+        response = self._request("GET", endpoint, metric or endpoint, retries=self.get_retries)
         return response.json()
 
-    def _make_post(self, endpoint: str, data: Optional[dict] = None) -> dict:
-        url = f"{self.endpoint_url}{endpoint}"
-        response = post(
-            url,
-            headers=self.headers,
-            json=data
-        )
-        response.raise_for_status()
+    def _make_post(self, endpoint: str, data: Optional[dict] = None, metric: Optional[str] = None) -> dict:
+        response = self._request("POST", endpoint, metric or endpoint, json=data, retries=self.post_retries)
         return response.json()
 
+    def latency_report(self) -> Dict[str, dict]:
+        """
+        Latency statistics in milliseconds per endpoint (including retries)
+        """
+        report = {}
+        with self._latencies_lock:
+            latencies = {name: sorted(values) for name, values in self.latencies.items()}
+        for name, values in latencies.items():
+            values_ms = [v * 1000 for v in values]
+            report[name] = {
+                "count": len(values_ms),
+                "mean": statistics.fmean(values_ms),
+                "p50": _percentile(values_ms, 50),
+                "p90": _percentile(values_ms, 90),
+                "max": values_ms[-1],
+            }
+        return report
+
+    def print_latency_report(self):
+        print("Agent API latencies (ms):")
+        for name, stats in self.latency_report().items():
+            print(
+                f"\t{name}: count={stats['count']} mean={stats['mean']:.1f} "
+                f"p50={stats['p50']:.1f} p90={stats['p90']:.1f} max={stats['max']:.1f}"
+            )
+        with self._latencies_lock:
+            timings = list(self.stream_timings.values())
+        first = sorted(t["time_to_first_message"] * 1000 for t in timings if t["time_to_first_message"] is not None)
+        if first:
+            print(
+                f"\ttime to first message: count={len(first)} mean={statistics.fmean(first):.1f} "
+                f"p50={_percentile(first, 50):.1f} max={first[-1]:.1f}"
+            )
+
+    def close(self):
+        self.pool.clear()
+
+    def get_agents(self, next_page: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+        """
+        Get one page of available agents
+        Returns the page with the agent objects in 'data' and the 'next' cursor when 'has_more' is set
+        """
+        params = {key: value for key, value in (("next", next_page), ("limit", limit)) if value}
+        endpoint = "/api/v1/agents" + (f"?{urlencode(params)}" if params else "")
+        return self._make_get(endpoint, metric="/api/v1/agents")
 
-    def get_agents(self) -> List[Dict]:
+    def iter_agents(self, page_size: Optional[int] = None) -> Iterator[Dict]:
         """
-        Get a list of all available agents
-        Returns a list of agent objects
+        Lazily iterate over all available agents, fetching the next page only when needed
         """
-        return self._make_get("/api/v1/agents")
+        next_page = None
+        while True:
+            page = self.get_agents(next_page, page_size)
+            yield from page["data"]
+            next_page = page.get("next")
+            if not page.get("has_more") or not next_page:
+                return
 
-    def create_conversation(self, name: str = "New Conversation") -> str:
+    def create_conversation(self, name: str = "New Conversation", agent_id: Optional[str] = None) -> str:
         """
-        Create a new conversation for the specified agent
+        Create a new conversation for the specified agent (default. the client's agent)
         Returns the conversation ID
         """
-        endpoint = f"/api/v1/agents/{self.agent_id}/conversations"
+        endpoint = f"/api/v1/agents/{agent_id or self.agent_id}/conversations"
         data = {"name": name}
-        response = self._make_post(endpoint, data)
+        response = self._make_post(endpoint, data, metric="/api/v1/agents/{agent_id}/conversations")
         return response.get("id")
 
-    def send_message(self, conversation_id: str, message: str) -> dict:
+    def send_message(self, conversation_id: str, message: str, agent_id: Optional[str] = None) -> dict:
         """
-        Send a message to an existing conversation
+        Send a message to an existing conversation of the specified agent (default. the client's agent)
         Returns the message response
         """
-        endpoint = f"/api/v1/agents/{self.agent_id}/conversations/{conversation_id}/messages"
+        endpoint = f"/api/v1/agents/{agent_id or self.agent_id}/conversations/{conversation_id}/messages"
         data = {"content": message}
-        return self._make_post(endpoint, data)
+        return self._make_post(endpoint, data, metric="/api/v1/agents/{agent_id}/conversations/{conversation_id}/messages")
+
+    def stream_message(self, conversation_id: str, message: str, agent_id: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Send a message to an existing conversation and yield the reply messages (text, action_request,
+        action_response) as the agent produces them (server-sent events)
+        Time to first message and time to completion are recorded in `stream_timings`
+        """
+        endpoint = f"/api/v1/agents/{agent_id or self.agent_id}/conversations/{conversation_id}/messages/stream"
+        metric = "POST /api/v1/agents/{agent_id}/conversations/{conversation_id}/messages/stream"
+        timings = {"time_to_first_message": None, "time_to_completion": None, "messages": 0}
+        with self._latencies_lock:
+            self.stream_timings[conversation_id] = timings
+
+        start = time.perf_counter()
+        response = self.pool.request(
+            "POST",
+            f"{self.endpoint_url}{endpoint}",
+            headers={**self.headers, "Accept": "text/event-stream"},
+            json={"content": message},
+            timeout=self.timeout,
+            retries=self.post_retries,
+            preload_content=False,
+        )
+        completed = False
+        try:
+            ResponseWrapper(response).raise_for_status()
+            for msg in _iter_stream_messages(response):
+                if timings["time_to_first_message"] is None:
+                    timings["time_to_first_message"] = time.perf_counter() - start
+                timings["messages"] += 1
+                yield msg
+            completed = True
+        finally:
+            if completed:
+                response.drain_conn()
+                response.release_conn()
+            else:
+                # Abandoned mid-stream: the connection can't be reused
+                response.close()
+            timings["time_to_completion"] = time.perf_counter() - start
+            with self._latencies_lock:
+                self.latencies[metric].append(timings["time_to_completion"])
+
+
+def _iter_stream_messages(response) -> Iterator[Dict]:
+    """
+    Parse the messages out of a server-sent events response as the bytes arrive
+    Falls back to a plain JSON response with all the messages if the server does not stream
+    """
+    if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+        yield from json.loads(response.read() or b"{}").get("messages", [])
+        return
+
+    if response.chunked:
+        chunks = response.read_chunked(decode_content=True)
+    elif hasattr(response, "read1"):
+        chunks = iter(lambda: response.read1(8192), b"")
+    else:
+        chunks = response.stream(8192)
+
+    buffer = b""
+    event, data = None, []
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line = line.rstrip(b"\r").decode("utf-8")
+            if line:
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+                continue
+            # A blank line dispatches the event
+            if event in ("done", "error") or data == ["[DONE]"]:
+                if event == "error":
+                    raise RuntimeError(f"Agent stream failed: {' '.join(data)}")
+                return
+            if data and event in (None, "message"):
+                yield json.loads("\n".join(data))
+            event, data = None, []
+
+
+class AgentNameIndex:
+    """
+    Process-wide agent name to ID index, filled from the full agent listing and refreshed after the TTL.
+    A name missing from the index triggers a refresh (at most once every `miss_refresh` seconds), so
+    agents created after the index was filled are found right away.
+    """
+
+    def __init__(self, ttl: float = AGENT_INDEX_TTL, miss_refresh: float = AGENT_INDEX_MISS_REFRESH):
+        self.ttl = ttl
+        self.miss_refresh = miss_refresh
+        self._ids: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get_id(self, client: Sema4APIClient, agent_name: str) -> Optional[str]:
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._load(client)
+            agent_id = self._ids.get(agent_name.lower())
+            if agent_id is None and time.monotonic() - self._loaded_at > self.miss_refresh:
+                self._load(client)
+                agent_id = self._ids.get(agent_name.lower())
+            return agent_id
+
+    def _load(self, client: Sema4APIClient):
+        self._ids = {agent["name"].lower(): agent["id"] for agent in client.iter_agents()}
+        self._loaded_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+            self._loaded_at = None
+
+
+_agent_index = AgentNameIndex()
+_client: Optional[Sema4APIClient] = None
+_client_lock = threading.Lock()
+
+
+def _get_client(pool_size: int = DEFAULT_POOL_SIZE) -> Sema4APIClient:
+    """
+    Client shared by all work items of the process (the vault is read only once)
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Sema4APIClient(pool_size=pool_size)
+        return _client
+
+
+def _build_pool_manager(pool_size: int) -> urllib3.PoolManager:
+    """
+    Keep-alive connection pool honoring the proxy settings of the Sema4.ai network profile
+    """
+    proxies = get_network_profile().proxy_config.https
+    kwargs = dict(maxsize=pool_size, ssl_context=build_ssl_context())
+    if proxies:
+        return urllib3.ProxyManager(proxies[0], **kwargs)
+    return urllib3.PoolManager(**kwargs)
 
 @task
 def list_available_agents():
-    client = Sema4APIClient()
-
-    # Get list of all agents
-    agents = client.get_agents()
+    client = _get_client()
 
+    # Get list of all agents, following the pages
     print("Available agents:")
-    print(f"\tnext = {agents['next']}, has_more = {agents['has_more']}")
-    for agent in agents['data']:
+    for agent in client.iter_agents():
         print(agent)
 
 
 @task
 def create_agent_conversation():
-    agent_id, conversation_name, prompt = _get_agent_variables(workitems.inputs.current.payload)
-    client = Sema4APIClient(agent_id)
-    conversation_id = client.create_conversation(conversation_name)
-    response = client.send_message(conversation_id, prompt)
-    _print_conversation_messages(response)
+    print(f"Input workitem payload: {workitems.inputs.current.payload}")
+    client = _get_client()
+    agent_id, conversation_name, prompt = _get_agent_variables(workitems.inputs.current.payload, client)
+    conversation_id = client.create_conversation(conversation_name, agent_id)
+    if _is_streaming(workitems.inputs.current.payload):
+        print("Messages in the conversation:")
+        start = time.perf_counter()
+        for msg in client.stream_message(conversation_id, prompt, agent_id):
+            print(f"\t[{time.perf_counter() - start:.2f}s] {_format_message(msg)}")
+        timings = client.stream_timings[conversation_id]
+        first = timings['time_to_first_message']
+        print(f"Time to first message: {'-' if first is None else f'{first:.2f}s'}, time to completion: {timings['time_to_completion']:.2f}s")
+    else:
+        response = client.send_message(conversation_id, prompt, agent_id)
+        _print_conversation_messages(response)
+    client.print_latency_report()
 
 
-def _get_agent_variables(item_payload):
-    print(f"Input workitem payload: {item_payload}")
+@task
+def create_agent_conversations_batch():
+    """
+    Runs the conversations of all input work items in parallel (AGENT_BATCH_CONCURRENCY at a time).
+
+    Only one input work item can be reserved at a time, so each input is released as soon
+    as it has been queued and the result of its conversation (status 'success' or 'failure')
+    is reported in its output work item.
+    """
+    concurrency = max(1, DEFAULT_BATCH_CONCURRENCY)
+    client = _get_client(pool_size=max(DEFAULT_POOL_SIZE, concurrency))
+    pending: Dict[Future, workitems.Output] = {}
+    results = []
+
+    def report(future: Future):
+        output = pending.pop(future)
+        result = future.result()
+        results.append(result)
+        output.payload = {**output.payload, **result}
+        output.save()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for item in workitems.inputs:
+            print(f"Input workitem payload: {item.payload}")
+            output = item.create_output()
+            output.payload = {"input": item.payload, "status": "queued"}
+            output.save()
+            pending[executor.submit(_run_conversation, client, item.payload)] = output
+            # Work item adapters are not thread-safe, so outputs are only saved from this thread
+            for future in [f for f in pending if f.done()]:
+                report(future)
+        for future in as_completed(list(pending)):
+            report(future)
+    elapsed = time.perf_counter() - start
+
+    _print_batch_summary(results, elapsed)
+    client.print_latency_report()
+
+
+@task
+def benchmark_agent():
+    """
+    Open-loop load test of the agent with the prompts in devdata/work-items-in.
+
+    Options are given as command line arguments of benchmark.py in BENCHMARK_ARGS,
+    e.g. "--rate 5 --requests 200 --baseline output/previous.json" (see `python benchmark.py --help`).
+    """
+    from benchmark import main
+
+    main(shlex.split(os.getenv("BENCHMARK_ARGS", "")))
+
+
+def _run_conversation(client: Sema4APIClient, item_payload) -> dict:
+    start = time.perf_counter()
+    try:
+        agent_id, conversation_name, prompt = _get_agent_variables(item_payload, client)
+        conversation_id = client.create_conversation(conversation_name, agent_id)
+        result = {"status": "success", "conversation_id": conversation_id}
+        if _is_streaming(item_payload):
+            result["messages"] = list(client.stream_message(conversation_id, prompt, agent_id))
+            result["time_to_first_message_seconds"] = client.stream_timings[conversation_id]["time_to_first_message"]
+        else:
+            result["messages"] = client.send_message(conversation_id, prompt, agent_id).get("messages", [])
+        result["latency_seconds"] = time.perf_counter() - start
+        return result
+    except Exception as e:
+        return {
+            "status": "failure",
+            "error": f"{type(e).__name__}: {e}",
+            "latency_seconds": time.perf_counter() - start,
+        }
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    # Nearest-rank percentile of sorted values (also used by benchmark.py, so the figures compare)
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+
+def _print_batch_summary(results: List[dict], elapsed: float):
+    succeeded = sum(1 for result in results if result["status"] == "success")
+    latencies = sorted(result["latency_seconds"] for result in results)
+    print(f"Processed {len(results)} work items in {elapsed:.1f}s: {succeeded} succeeded, {len(results) - succeeded} failed")
+    if latencies:
+        print(f"\tthroughput: {len(results) / elapsed:.2f} items/s")
+        print(
+            f"\tlatency per item (s): mean={statistics.fmean(latencies):.2f} p50={_percentile(latencies, 50):.2f} "
+            f"p90={_percentile(latencies, 90):.2f} max={latencies[-1]:.2f}"
+        )
+
+
+def _get_agent_variables(item_payload, client: Optional[Sema4APIClient] = None):
     agent_id = item_payload['agent_id'] if item_payload and "agent_id" in item_payload.keys() else None
     agent_name = item_payload['agent_name'] if item_payload and "agent_name" in item_payload.keys() else None
     if agent_name:
-        agent_id = _get_agent_id(agent_name)
+        agent_id = _get_agent_id(agent_name, client)
     conversation_name = item_payload['conversation_name'] if item_payload and "conversation_name" in item_payload.keys() else DEFAULT_CONVERSATION_NAME
     prompt = item_payload['prompt'] if item_payload and "prompt" in item_payload.keys() else DEFAULT_PROMPT
     return agent_id, conversation_name, prompt
 
+def _is_streaming(item_payload) -> bool:
+    return bool(item_payload and item_payload.get("stream"))
+
 def _print_conversation_messages(response):
     print("Messages in the conversation:")
     for msg in response['messages']:
-        msg_type = msg['type']
-        content = msg['content']
-        if msg_type == 'action_request':
-            content = ','.join([act['name'] for act in msg['action_calls']])
-        elif msg_type == 'action_response':
-            content = msg['status']
-        print(f"\ttype: {msg_type}, content: {content}")
-
-def _get_agent_id(agent_name):
-    client = Sema4APIClient()
-    agents = client.get_agents()
-    for agent in agents['data']:
-        if agent['name'].lower() == agent_name.lower():
-            return agent['id']
+        print(f"\t{_format_message(msg)}")
+
+def _format_message(msg) -> str:
+    msg_type = msg['type']
+    content = msg['content']
+    if msg_type == 'action_request':
+        content = ','.join([act['name'] for act in msg['action_calls']])
+    elif msg_type == 'action_response':
+        content = msg['status']
+    return f"type: {msg_type}, content: {content}"
+
+def _get_agent_id(agent_name, client: Optional[Sema4APIClient] = None):
+    agent_id = _agent_index.get_id(client or _get_client(), agent_name)
+    if agent_id:
+        return agent_id
     raise ValueError(f"Agent with name '{agent_name}' not found")
@@ -0,0 +1,194 @@
+"""
+Record/replay of HTTP traffic for offline, deterministic runs of actions and tasks.
+
+Requests are intercepted at the urllib3 connection pool, which both `sema4ai_http` and
+`requests` (and so `Sema4APIClient`, `api-jokes`, `chat-files`, `hibob` and license-guru's
+PyPI/Snyk/GitHub calls) go through. In `record` mode the real responses are saved to a
+cassette file; in `replay` mode they are served from the cassette without touching the
+network, optionally with synthetic latency:
+
+    from cassette import use_cassette
+
+    with use_cassette("devdata/cassettes/input_search_jokes.json", mode="replay", latency="recorded"):
+        search_jokes("dog")
+
+Interactions are matched on method, URL and a hash of the request body. Repeated identical
+requests are served in recorded order, and the last recording is reused once they run out.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import urllib3
+from urllib3.connectionpool import HTTPConnectionPool
+
+MODES = ("record", "replay", "off")
+CASSETTE_VERSION = 1
+
+# Hop-by-hop headers that don't apply to a response rebuilt from stored bytes
+_DROPPED_HEADERS = {"transfer-encoding", "content-length", "connection", "keep-alive"}
+
+
+class CassetteMissError(Exception):
+    """No recorded interaction matches a request made in replay mode."""
+
+
+class Cassette:
+    def __init__(self, path: Union[str, Path], mode: str = "replay", latency: Union[None, str, float] = None):
+        """
+        Args:
+            path: Cassette file.
+            mode: 'record' (call the network and save), 'replay' (serve from the cassette) or 'off'.
+            latency: Synthetic latency in replay mode: None for none, 'recorded' for the latency
+                measured when recording, or a number of seconds (+-25% jitter).
+        """
+        if mode not in MODES:
+            raise ValueError(f"Invalid cassette mode '{mode}', expected one of {MODES}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.interactions: List[dict] = []
+        self.misses: List[str] = []
+        self._served: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self.load()
+
+    def load(self):
+        if not self.path.exists():
+            raise FileNotFoundError(f"Cassette {self.path} not found, record it first")
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.interactions = data["interactions"]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"version": CASSETTE_VERSION, "interactions": self.interactions}, f, indent=2)
+
+    def record(self, method: str, url: str, body, response: urllib3.BaseHTTPResponse, raw: bytes, elapsed: float):
+        interaction = {
+            "request": {"method": method.upper(), "url": url, "body_sha256": _body_hash(body)},
+            "response": {
+                "status": response.status,
+                "reason": response.reason,
+                "headers": [
+                    [name, value]
+                    for name, value in response.headers.items()
+                    if name.lower() not in _DROPPED_HEADERS
+                ],
+                "body_base64": base64.b64encode(raw).decode("ascii"),
+                "elapsed_seconds": elapsed,
+            },
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def find(self, method: str, url: str, body) -> dict:
+        key = (method.upper(), url, _body_hash(body))
+        with self._lock:
+            matches = [
+                i for i in self.interactions
+                if (i["request"]["method"], i["request"]["url"], i["request"]["body_sha256"]) == key
+            ]
+            if not matches:
+                self.misses.append(f"{method.upper()} {url}")
+                raise CassetteMissError(f"No recorded response for {method.upper()} {url} in {self.path}")
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        return matches[min(served, len(matches) - 1)]["response"]
+
+    def delay(self, recorded: dict) -> float:
+        if self.latency is None:
+            return 0.0
+        if self.latency == "recorded":
+            return recorded.get("elapsed_seconds", 0.0)
+        return max(0.0, float(self.latency) * random.uniform(0.75, 1.25))
+
+
+def _body_hash(body) -> Optional[str]:
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if not isinstance(body, (bytes, bytearray)):
+        # Streamed bodies (files, generators) can't be hashed without consuming them
+        return "<stream>"
+    return hashlib.sha256(body).hexdigest()
+
+
+def _build_response(recorded: dict, method: str, url: str, preload_content: bool, decode_content: bool):
+    raw = base64.b64decode(recorded["body_base64"])
+    headers = urllib3.HTTPHeaderDict()
+    for name, value in recorded["headers"]:
+        headers.add(name, value)
+    headers["Content-Length"] = str(len(raw))
+    return urllib3.HTTPResponse(
+        body=io.BytesIO(raw),
+        headers=headers,
+        status=recorded["status"],
+        reason=recorded.get("reason"),
+        preload_content=preload_content,
+        decode_content=decode_content,
+        request_method=method,
+        request_url=url,
+    )
+
+
+_active: Optional[Cassette] = None
+_original_urlopen = HTTPConnectionPool.urlopen
+
+
+def _urlopen(self, method, url, body=None, headers=None, *args, preload_content=True, decode_content=True, **kwargs):
+    cassette = _active
+    if cassette is None or cassette.mode == "off":
+        return _original_urlopen(
+            self, method, url, body, headers, *args,
+            preload_content=preload_content, decode_content=decode_content, **kwargs
+        )
+
+    full_url = url if "://" in url else f"{self.scheme}://{self.host}:{self.port}{url}"
+
+    if cassette.mode == "replay":
+        recorded = cassette.find(method, full_url, body)
+        delay = cassette.delay(recorded)
+        if delay:
+            time.sleep(delay)
+        return _build_response(recorded, method, full_url, preload_content, decode_content)
+
+    start = time.perf_counter()
+    response = _original_urlopen(
+        self, method, url, body, headers, *args, preload_content=False, decode_content=False, **kwargs
+    )
+    raw = response.read(decode_content=False)
+    elapsed = time.perf_counter() - start
+    response.release_conn()
+    cassette.record(method, full_url, body, response, raw, elapsed)
+    recorded = cassette.interactions[-1]["response"]
+    return _build_response(recorded, method, full_url, preload_content, decode_content)
+
+
+@contextmanager
+def use_cassette(path: Union[str, Path], mode: str = "replay", latency: Union[None, str, float] = None):
+    """Intercepts all urllib3 based HTTP calls made in the block with the given cassette."""
+    global _active
+    if _active is not None:
+        raise RuntimeError("A cassette is already in use")
+    cassette = Cassette(path, mode, latency)
+    _active = cassette
+    HTTPConnectionPool.urlopen = _urlopen
+    try:
+        yield cassette
+    finally:
+        HTTPConnectionPool.urlopen = _original_urlopen
+        _active = None
+        if mode == "record":
+            cassette.save()
@@ -0,0 +1,187 @@
+"""
+Runs the `devdata/input_*.json` scenarios of an action package as offline benchmarks.
+
+Record the cassettes once against the live services, then replay them as many times as needed:
+
+    python tools/http-cassette/run_scenarios.py actions/api-jokes --mode record
+    python tools/http-cassette/run_scenarios.py actions/api-jokes --repeat 20 --latency recorded
+
+Cassettes are stored next to the scenarios in `devdata/cassettes/<scenario>.json`.
+Environment variables in `devdata/cassettes/env.json` are set before the action module is
+imported, e.g. to record against a local mock of the service and replay with the same URLs.
+Secrets in the scenario inputs are taken from the input file, or from the environment
+variable named like the parameter in upper case (e.g. API_KEY) when the input has a placeholder.
+The other inputs are converted to the annotated argument types (e.g. pydantic models) like the
+action server does.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+import typing
+from pathlib import Path
+
+from cassette import CassetteMissError, use_cassette
+
+# Argument types the action server passes through without conversion
+_JSON_TYPES = (str, int, float, bool)
+
+
+def load_scenarios(package_dir: Path) -> list:
+    scenarios = []
+    for input_file in sorted((package_dir / "devdata").glob("input_*.json")):
+        with open(input_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "inputs" not in data:
+            # Older input files only hold the arguments of the action named after the file
+            data = {"inputs": [{"inputName": "input-1", "inputValue": data}],
+                    "metadata": {"actionName": input_file.stem[len("input_"):]}}
+        metadata = data["metadata"]
+        for scenario_input in data["inputs"]:
+            scenarios.append({
+                "name": input_file.stem if len(data["inputs"]) == 1 else f"{input_file.stem}-{scenario_input['inputName']}",
+                "action": metadata["actionName"],
+                "module": metadata.get("actionRelativePath", "actions.py"),
+                "managed_params": metadata.get("managedParamsSchemaDescription", {}),
+                "inputs": scenario_input["inputValue"],
+            })
+    return scenarios
+
+
+def load_env(package_dir: Path) -> dict:
+    """
+    Environment variables the scenarios are recorded and replayed with, from
+    `devdata/cassettes/env.json` (e.g. the URL of a local mock of the service)
+    """
+    env_file = package_dir / "devdata" / "cassettes" / "env.json"
+    if not env_file.exists():
+        return {}
+    with open(env_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_action(package_dir: Path, module_path: str, action_name: str):
+    sys.path.insert(0, str(package_dir))
+    module_name = Path(module_path).stem
+    spec = importlib.util.spec_from_file_location(module_name, package_dir / module_path)
+    module = sys.modules.get(module_name)
+    if module is None or getattr(module, "__file__", None) != str(package_dir / module_path):
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return getattr(module, action_name)
+
+
+def build_kwargs(action, scenario: dict) -> dict:
+    """
+    Convert the JSON inputs to the argument types of the action, as the action server does:
+    plain JSON types are passed as is, other annotations (pydantic models, lists of them, ...)
+    are validated from the JSON value.
+    """
+    from pydantic import TypeAdapter
+
+    type_hints = typing.get_type_hints(action)
+    kwargs = {}
+    for name, value in scenario["inputs"].items():
+        managed = scenario["managed_params"].get(name, {})
+        if managed.get("type") in ("Secret", "OAuth2Secret"):
+            from sema4ai.actions import Secret
+
+            if not value or value.startswith("<"):
+                value = os.getenv(name.upper(), "")
+            value = Secret.model_validate(value)
+        elif type_hints.get(name, str) not in _JSON_TYPES:
+            value = TypeAdapter(type_hints[name]).validate_python(value)
+        kwargs[name] = value
+    return kwargs
+
+
+def run_scenario(package_dir: Path, scenario: dict, mode: str, latency, repeat: int) -> dict:
+    cassette_path = package_dir / "devdata" / "cassettes" / f"{scenario['name']}.json"
+    if mode == "replay" and not cassette_path.exists():
+        return {"scenario": scenario["name"], "action": scenario["action"], "runs": 0, "http_interactions": 0,
+                "error": f"no cassette at {cassette_path}, run with --mode record first"}
+    try:
+        action = load_action(package_dir, scenario["module"], scenario["action"])
+        kwargs = build_kwargs(action, scenario)
+    except Exception as e:
+        return {"scenario": scenario["name"], "action": scenario["action"], "runs": 0, "http_interactions": 0,
+                "error": f"could not prepare the call: {type(e).__name__}: {e}"}
+    durations, error = [], None
+    runs = 1 if mode == "record" else repeat
+    for _ in range(runs):
+        with use_cassette(cassette_path, mode=mode, latency=latency) as cassette:
+            start = time.perf_counter()
+            try:
+                action(**kwargs)
+            except CassetteMissError as e:
+                error = f"cassette miss: {e}"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            durations.append(time.perf_counter() - start)
+        if error:
+            break
+    result = {
+        "scenario": scenario["name"],
+        "action": scenario["action"],
+        "runs": len(durations),
+        "http_interactions": len(cassette.interactions),
+        "error": error,
+    }
+    if durations:
+        durations_ms = sorted(d * 1000 for d in durations)
+        result.update({
+            "mean_ms": statistics.fmean(durations_ms),
+            "p50_ms": statistics.median(durations_ms),
+            "max_ms": durations_ms[-1],
+        })
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("package_dir", type=Path, help="Action package directory")
+    parser.add_argument("--mode", choices=("record", "replay"), default="replay")
+    parser.add_argument("--latency", default=None, help="Replay latency: 'recorded' or seconds per request")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per scenario in replay mode")
+    parser.add_argument("--scenario", action="append", help="Only run scenarios with this name")
+    parser.add_argument("--output", type=Path, help="Save the results as JSON")
+    args = parser.parse_args(argv)
+
+    latency = args.latency
+    if latency not in (None, "recorded"):
+        latency = float(latency)
+    package_dir = args.package_dir.absolute()
+    output = args.output.absolute() if args.output else None
+
+    # Actions resolve relative paths (e.g. devdata/.env, files/) against the package, and may
+    # read their configuration when imported
+    os.chdir(package_dir)
+    os.environ.update(load_env(package_dir))
+    results = []
+    for scenario in load_scenarios(package_dir):
+        if args.scenario and scenario["name"] not in args.scenario:
+            continue
+        result = run_scenario(package_dir, scenario, args.mode, latency, args.repeat)
+        results.append(result)
+        if result["error"]:
+            print(f"{result['scenario']}: FAILED ({result['error']})")
+        else:
+            print(
+                f"{result['scenario']}: {result['runs']} run(s), {result['http_interactions']} HTTP interaction(s), "
+                f"mean={result['mean_ms']:.1f}ms p50={result['p50_ms']:.1f}ms max={result['max_ms']:.1f}ms"
+            )
+
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()